@@ -1,15 +1,26 @@
+import functools
 import io
-import json
+import multiprocessing
 import os
+import shutil
 import sqlite3
+import threading
 import uuid
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
 from flask import Flask, jsonify, request, send_file, send_from_directory
+from flask.json.provider import JSONProvider
+import numpy as np
+import orjson
 from PIL import Image, ImageDraw, ImageFont
-from svglib.svglib import svg2rlg
-from reportlab.graphics import renderPM
+
+try:
+    import cairosvg
+except (ImportError, OSError):
+    # CairoSVG needs the native libcairo; without it only PNG icons work.
+    cairosvg = None
 
 APP_ROOT = Path(__file__).parent
 DATA_DIR = APP_ROOT / "data"
@@ -19,7 +30,11 @@ PREVIEWS_DIR = DATA_DIR / "previews"
 RENDERS_DIR = DATA_DIR / "renders"
 
 TILE_SIZE = 450
+IMMUTABLE_MAX_AGE = 31536000
 DEFAULT_RADIUS = 30
+RENDER_WORKERS = min(4, os.cpu_count() or 1)
+ICON_CACHE_SIZE = 64
+SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
 
 COLOR_PRESETS = [
     {"name": "AXE Green", "hex": "#4ccd4f"},
@@ -45,13 +60,50 @@ DEFAULT_LAYOUT = {
 
 
 STORAGE_READY = False
+_MASK_CACHE = {}
+_DB_LOCAL = threading.local()
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _new_executor():
+    # Never fork the threaded server: a child can inherit held locks and open
+    # SQLite handles. forkserver is unavailable on Windows, so use spawn there.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        start_method = "forkserver"
+    else:
+        start_method = "spawn"
+    return ProcessPoolExecutor(
+        max_workers=RENDER_WORKERS,
+        mp_context=multiprocessing.get_context(start_method),
+    )
+
+
+EXECUTOR = None
+
+
+def _get_executor():
+    global EXECUTOR
+    with _EXECUTOR_LOCK:
+        if EXECUTOR is None:
+            EXECUTOR = _new_executor()
+        return EXECUTOR
 
 
 def get_db():
-    if not STORAGE_READY:
-        init_storage()
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    conn = getattr(_DB_LOCAL, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        conn.create_function("py_lower", 1, str.lower, deterministic=True)
+        conn.executescript(
+            """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA cache_size=-20000;
+            PRAGMA temp_store=MEMORY;
+            """
+        )
+        _DB_LOCAL.conn = conn
     return conn
 
 
@@ -62,40 +114,34 @@ def init_storage():
     PREVIEWS_DIR.mkdir(exist_ok=True)
     RENDERS_DIR.mkdir(exist_ok=True)
 
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute(
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.executescript(
             """
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            BEGIN IMMEDIATE;
             CREATE TABLE IF NOT EXISTS icons (
                 id TEXT PRIMARY KEY,
                 name TEXT NOT NULL,
                 tags TEXT,
                 file_path TEXT NOT NULL,
                 preview_path TEXT NOT NULL,
+                format TEXT,
                 created_at TEXT NOT NULL
-            )
-            """
-        )
-        conn.execute(
-            """
+            );
+            CREATE INDEX IF NOT EXISTS idx_icons_created ON icons(created_at DESC);
             CREATE TABLE IF NOT EXISTS color_presets (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 name TEXT NOT NULL,
                 hex TEXT NOT NULL
-            )
-            """
-        )
-        conn.execute(
-            """
+            );
             CREATE TABLE IF NOT EXISTS layout_presets (
                 id TEXT PRIMARY KEY,
                 name TEXT NOT NULL,
                 params TEXT NOT NULL,
                 created_at TEXT NOT NULL
-            )
-            """
-        )
-        conn.execute(
-            """
+            );
             CREATE TABLE IF NOT EXISTS renders (
                 id TEXT PRIMARY KEY,
                 name TEXT NOT NULL,
@@ -104,9 +150,16 @@ def init_storage():
                 layout_params TEXT NOT NULL,
                 output_path TEXT NOT NULL,
                 created_at TEXT NOT NULL
-            )
+            );
+            CREATE INDEX IF NOT EXISTS idx_renders_created ON renders(created_at DESC);
             """
         )
+        icon_columns = {row[1] for row in conn.execute("PRAGMA table_info(icons)")}
+        if "format" not in icon_columns:
+            conn.execute("ALTER TABLE icons ADD COLUMN format TEXT")
+            conn.execute(
+                "UPDATE icons SET format = lower(substr(file_path, -3)) WHERE format IS NULL"
+            )
         if conn.execute("SELECT COUNT(*) FROM color_presets").fetchone()[0] == 0:
             conn.executemany(
                 "INSERT INTO color_presets (name, hex) VALUES (?, ?)",
@@ -114,18 +167,50 @@ def init_storage():
             )
         if conn.execute("SELECT COUNT(*) FROM layout_presets").fetchone()[0] == 0:
             conn.execute(
-                "INSERT INTO layout_presets (id, name, params, created_at) VALUES (?, ?, ?, ?)",
+                f"INSERT INTO layout_presets (id, name, params, created_at) VALUES (?, ?, ?, {SQL_NOW})",
                 (
                     str(uuid.uuid4()),
                     DEFAULT_LAYOUT["name"],
-                    json.dumps(DEFAULT_LAYOUT),
-                    datetime.utcnow().isoformat(),
+                    orjson.dumps(DEFAULT_LAYOUT).decode(),
                 ),
             )
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
     STORAGE_READY = True
 
 
+class OrjsonProvider(JSONProvider):
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype="application/json")
+
+
 app = Flask(__name__, static_folder="static", template_folder="templates")
+app.json = OrjsonProvider(app)
+app.config["USE_X_SENDFILE"] = os.environ.get("USE_X_SENDFILE") == "1"
+
+
+@app.before_request
+def ensure_storage():
+    if not STORAGE_READY:
+        init_storage()
+
+
+@app.teardown_appcontext
+def release_db(exception):
+    conn = getattr(_DB_LOCAL, "conn", None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
 
 
 def hex_to_rgba(hex_value):
@@ -137,6 +222,7 @@ def hex_to_rgba(hex_value):
     return tuple(int(hex_value[i : i + 2], 16) for i in (1, 3, 5)) + (255,)
 
 
+@functools.lru_cache(maxsize=32)
 def load_font(size, weight):
     try:
         if weight in {"bold", "semibold"}:
@@ -150,32 +236,97 @@ def truncate_text(text, font, max_width):
     if font.getlength(text) <= max_width:
         return text
     ellipsis = "…"
-    trimmed = text
-    while trimmed and font.getlength(trimmed + ellipsis) > max_width:
-        trimmed = trimmed[:-1]
-    return trimmed + ellipsis if trimmed else ellipsis
-
-
-def rasterize_icon(icon_path, size):
-    suffix = Path(icon_path).suffix.lower()
-    if suffix == ".svg":
-        drawing = svg2rlg(str(icon_path))
-        if drawing:
-            renderPM.drawToFile(drawing, icon_path.replace('.svg', '.png'), fmt='PNG', dpi=96)
-            image = Image.open(icon_path.replace('.svg', '.png')).convert("RGBA")
-            if color_hex:
-                try:
-                    fill_color = hex_to_rgba(color_hex)
-                except ValueError:
-                    fill_color = None
-                if fill_color:
-                    alpha = image.getchannel("A")
-                    colored = Image.new("RGBA", image.size, fill_color)
-                    colored.putalpha(alpha)
-                    image = colored
-            return image.resize((size, size), Image.LANCZOS)
-    image = Image.open(icon_path).convert("RGBA")
-    return image.resize((size, size), Image.LANCZOS)
+    lo, hi = 0, len(text) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if font.getlength(text[:mid] + ellipsis) <= max_width:
+            lo = mid
+        else:
+            hi = mid - 1
+    return text[:lo] + ellipsis
+
+
+@functools.lru_cache(maxsize=ICON_CACHE_SIZE)
+def _rasterize_icon_cached(icon_path, mtime, size, icon_format):
+    image = _rasterize_icon_uncached(icon_path, size, icon_format)
+    return image.size, image.tobytes()
+
+
+def _rasterize_icon_uncached(icon_path, size, icon_format):
+    if icon_format == "svg":
+        png_bytes = cairosvg.svg2png(
+            url=icon_path, output_width=size, output_height=size
+        )
+        return Image.open(io.BytesIO(png_bytes)).convert("RGBA")
+    image = Image.open(icon_path)
+    image.draft("RGBA", (size * 2, size * 2))
+    image = image.convert("RGBA")
+    return image.resize((size, size), Image.LANCZOS, reducing_gap=2.0)
+
+
+def icon_format_for(icon_path):
+    return Path(icon_path).suffix.lower().lstrip(".")
+
+
+def rasterize_icon(icon_path, size, color_hex=None, icon_format=None):
+    icon_path = str(icon_path)
+    if icon_format is None:
+        icon_format = icon_format_for(icon_path)
+    image_size, pixels = _rasterize_icon_cached(
+        icon_path, os.path.getmtime(icon_path), size, icon_format
+    )
+    if icon_format == "svg" and color_hex:
+        try:
+            fill_color = hex_to_rgba(color_hex)
+        except ValueError:
+            fill_color = None
+        if fill_color:
+            pixels = np.frombuffer(pixels, dtype=np.uint8).reshape(
+                image_size[1], image_size[0], 4
+            ).copy()
+            pixels[..., :3] = fill_color[:3]
+            return Image.fromarray(pixels)
+    return Image.frombytes("RGBA", image_size, pixels)
+
+
+def _rounded_mask(radius):
+    radius = max(0, min(radius, TILE_SIZE // 2))
+    key = (radius, TILE_SIZE)
+    mask = _MASK_CACHE.get(key)
+    if mask is None:
+        mask = Image.new("L", (TILE_SIZE, TILE_SIZE), 0)
+        ImageDraw.Draw(mask).rounded_rectangle(
+            [0, 0, TILE_SIZE, TILE_SIZE], radius=radius, fill=255
+        )
+        _MASK_CACHE[key] = mask
+    return mask
+
+
+def save_icon_preview(icon_path, preview_path, size, icon_format):
+    if icon_format != "png":
+        preview_image = rasterize_icon(icon_path, size, icon_format=icon_format)
+        preview_image.save(preview_path, "PNG", compress_level=1, optimize=False)
+        return
+    with Image.open(icon_path) as image:
+        if max(image.size) <= size:
+            shutil.copyfile(icon_path, preview_path)
+            return
+        image.thumbnail((size, size), Image.LANCZOS)
+        image.save(preview_path, "PNG", compress_level=1, optimize=False)
+
+
+def recompress_png(path, level):
+    path = Path(path)
+    target = path.with_name(f"{path.stem}.z{level}.png")
+    if not target.exists():
+        partial = target.with_name(f"{target.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with Image.open(path) as image:
+                image.save(partial, "PNG", compress_level=level, optimize=False)
+            os.replace(partial, target)
+        finally:
+            partial.unlink(missing_ok=True)
+    return target
 
 
 def render_tile(payload):
@@ -184,19 +335,21 @@ def render_tile(payload):
     layout = payload.get("layout", {})
     icon_info = payload.get("icon")
 
-    base = Image.new("RGBA", (TILE_SIZE, TILE_SIZE), hex_to_rgba(color))
-    mask = Image.new("L", (TILE_SIZE, TILE_SIZE), 0)
-    mask_draw = ImageDraw.Draw(mask)
     radius = int(layout.get("corner_radius_px", DEFAULT_RADIUS))
-    mask_draw.rounded_rectangle(
-        [0, 0, TILE_SIZE, TILE_SIZE], radius=radius, fill=255
-    )
-    base.putalpha(mask)
+    pixels = np.empty((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    pixels[..., :3] = hex_to_rgba(color)[:3]
+    pixels[..., 3] = np.asarray(_rounded_mask(radius))
+    base = Image.fromarray(pixels)
 
     if icon_info:
         icon_scale = float(icon_info.get("scale", 0.45))
-        icon_size = max(1, int(TILE_SIZE * icon_scale))
-        icon_image = rasterize_icon(icon_info["path"], icon_size)
+        icon_size = max(1, min(TILE_SIZE, int(TILE_SIZE * icon_scale)))
+        icon_image = rasterize_icon(
+            icon_info["path"],
+            icon_size,
+            icon_info.get("color_hex"),
+            icon_info.get("format"),
+        )
         icon_x = int(icon_info.get("x", TILE_SIZE / 2) - icon_size / 2)
         icon_y = int(icon_info.get("y", TILE_SIZE / 2) - icon_size / 2)
         base.alpha_composite(icon_image, (icon_x, icon_y))
@@ -216,6 +369,34 @@ def render_tile(payload):
     return base
 
 
+def _render_and_save(payload, output_path):
+    tile = render_tile(payload)
+    png_buffer = io.BytesIO()
+    tile.save(png_buffer, "PNG", compress_level=1, optimize=False)
+    png_bytes = png_buffer.getvalue()
+    Path(output_path).write_bytes(png_bytes)
+    return png_bytes
+
+
+def _discard_broken_executor(broken):
+    global EXECUTOR
+    with _EXECUTOR_LOCK:
+        if EXECUTOR is broken:
+            EXECUTOR = None
+    broken.shutdown(wait=False)
+
+
+def render_in_pool(payload, output_path):
+    for attempt in range(2):
+        executor = _get_executor()
+        try:
+            return executor.submit(_render_and_save, payload, output_path).result()
+        except BrokenProcessPool:
+            _discard_broken_executor(executor)
+            if attempt:
+                raise
+
+
 @app.route("/")
 def index():
     return send_from_directory("templates", "index.html")
@@ -223,8 +404,8 @@ def index():
 
 @app.route("/api/colors")
 def get_colors():
-    with get_db() as conn:
-        rows = conn.execute("SELECT id, name, hex FROM color_presets").fetchall()
+    conn = get_db()
+    rows = conn.execute("SELECT id, name, hex FROM color_presets").fetchall()
     return jsonify([dict(row) for row in rows])
 
 
@@ -239,54 +420,63 @@ def icons():
         suffix = Path(file.filename).suffix.lower()
         if suffix not in {".svg", ".png"}:
             return jsonify({"error": "Only SVG or PNG supported"}), 400
+        if suffix == ".svg" and cairosvg is None:
+            return jsonify({"error": "SVG support is not available"}), 400
         icon_id = str(uuid.uuid4())
         file_path = ICONS_DIR / f"{icon_id}{suffix}"
         file.save(file_path)
-        preview_image = rasterize_icon(file_path, 256)
+        icon_format = icon_format_for(file_path)
         preview_path = PREVIEWS_DIR / f"{icon_id}.png"
-        preview_image.save(preview_path)
-        with get_db() as conn:
-            conn.execute(
-                "INSERT INTO icons (id, name, tags, file_path, preview_path, created_at) VALUES (?, ?, ?, ?, ?, ?)",
-                (
-                    icon_id,
-                    name,
-                    tags,
-                    str(file_path),
-                    str(preview_path),
-                    datetime.utcnow().isoformat(),
-                ),
-            )
+        save_icon_preview(file_path, preview_path, 256, icon_format)
+        conn = get_db()
+        conn.execute(
+            f"INSERT INTO icons (id, name, tags, file_path, preview_path, format, created_at) VALUES (?, ?, ?, ?, ?, ?, {SQL_NOW})",
+            (
+                icon_id,
+                name,
+                tags,
+                str(file_path),
+                str(preview_path),
+                icon_format,
+            ),
+        )
+        conn.commit()
         return jsonify({"id": icon_id}), 201
 
     query = request.args.get("query", "").lower()
     tag = request.args.get("tag", "").lower()
-    with get_db() as conn:
-        rows = conn.execute("SELECT * FROM icons ORDER BY created_at DESC").fetchall()
-    results = []
-    for row in rows:
-        if query and query not in row["name"].lower():
-            continue
-        if tag and tag not in (row["tags"] or "").lower():
-            continue
-        results.append(
+    sql = "SELECT id, name, tags FROM icons WHERE 1 = 1"
+    params = []
+    if query:
+        sql += " AND instr(py_lower(name), ?) > 0"
+        params.append(query)
+    if tag:
+        sql += " AND instr(py_lower(COALESCE(tags, '')), ?) > 0"
+        params.append(tag)
+    sql += " ORDER BY created_at DESC"
+    conn = get_db()
+    rows = conn.execute(sql, params).fetchall()
+    return jsonify(
+        [
             {
                 "id": row["id"],
                 "name": row["name"],
                 "tags": row["tags"],
                 "preview_url": f"/api/icons/{row['id']}/preview",
             }
-        )
-    return jsonify(results)
+            for row in rows
+        ]
+    )
 
 
 @app.route("/api/icons/<icon_id>", methods=["DELETE"])
 def delete_icon(icon_id):
-    with get_db() as conn:
-        row = conn.execute("SELECT file_path, preview_path FROM icons WHERE id = ?", (icon_id,)).fetchone()
-        if not row:
-            return jsonify({"error": "Not found"}), 404
-        conn.execute("DELETE FROM icons WHERE id = ?", (icon_id,))
+    conn = get_db()
+    row = conn.execute("SELECT file_path, preview_path FROM icons WHERE id = ?", (icon_id,)).fetchone()
+    if not row:
+        return jsonify({"error": "Not found"}), 404
+    conn.execute("DELETE FROM icons WHERE id = ?", (icon_id,))
+    conn.commit()
     for path in [row["file_path"], row["preview_path"]]:
         try:
             os.remove(path)
@@ -297,11 +487,19 @@ def delete_icon(icon_id):
 
 @app.route("/api/icons/<icon_id>/preview")
 def icon_preview(icon_id):
-    with get_db() as conn:
-        row = conn.execute("SELECT preview_path FROM icons WHERE id = ?", (icon_id,)).fetchone()
-    if not row:
+    filename = f"{icon_id}.png"
+    if not (PREVIEWS_DIR / filename).exists():
         return jsonify({"error": "Not found"}), 404
-    return send_file(row["preview_path"], mimetype="image/png")
+    response = send_from_directory(
+        PREVIEWS_DIR,
+        filename,
+        mimetype="image/png",
+        conditional=True,
+        etag=icon_id,
+        max_age=IMMUTABLE_MAX_AGE,
+    )
+    response.cache_control.immutable = True
+    return response
 
 
 @app.route("/api/layout-presets", methods=["GET", "POST"])
@@ -313,21 +511,22 @@ def layout_presets():
         if not name or not params:
             return jsonify({"error": "Missing name or params"}), 400
         preset_id = str(uuid.uuid4())
-        with get_db() as conn:
-            conn.execute(
-                "INSERT INTO layout_presets (id, name, params, created_at) VALUES (?, ?, ?, ?)",
-                (preset_id, name, json.dumps(params), datetime.utcnow().isoformat()),
-            )
+        conn = get_db()
+        conn.execute(
+            f"INSERT INTO layout_presets (id, name, params, created_at) VALUES (?, ?, ?, {SQL_NOW})",
+            (preset_id, name, orjson.dumps(params).decode()),
+        )
+        conn.commit()
         return jsonify({"id": preset_id}), 201
 
-    with get_db() as conn:
-        rows = conn.execute("SELECT * FROM layout_presets ORDER BY created_at DESC").fetchall()
+    conn = get_db()
+    rows = conn.execute("SELECT * FROM layout_presets ORDER BY created_at DESC").fetchall()
     return jsonify(
         [
             {
                 "id": row["id"],
                 "name": row["name"],
-                "params": json.loads(row["params"]),
+                "params": orjson.loads(row["params"]),
             }
             for row in rows
         ]
@@ -337,8 +536,9 @@ def layout_presets():
 @app.route("/api/layout-presets/<preset_id>", methods=["PUT", "DELETE"])
 def layout_preset_detail(preset_id):
     if request.method == "DELETE":
-        with get_db() as conn:
-            conn.execute("DELETE FROM layout_presets WHERE id = ?", (preset_id,))
+        conn = get_db()
+        conn.execute("DELETE FROM layout_presets WHERE id = ?", (preset_id,))
+        conn.commit()
         return jsonify({"status": "deleted"})
 
     payload = request.get_json(force=True)
@@ -346,11 +546,12 @@ def layout_preset_detail(preset_id):
     params = payload.get("params")
     if not name or not params:
         return jsonify({"error": "Missing name or params"}), 400
-    with get_db() as conn:
-        conn.execute(
-            "UPDATE layout_presets SET name = ?, params = ? WHERE id = ?",
-            (name, json.dumps(params), preset_id),
-        )
+    conn = get_db()
+    conn.execute(
+        "UPDATE layout_presets SET name = ?, params = ? WHERE id = ?",
+        (name, orjson.dumps(params).decode(), preset_id),
+    )
+    conn.commit()
     return jsonify({"status": "updated"})
 
 
@@ -371,49 +572,59 @@ def render_api():
         return jsonify({"error": "Invalid color hex"}), 400
 
     icon_path = None
+    icon_format = None
     if icon_id:
-        with get_db() as conn:
-            row = conn.execute("SELECT file_path FROM icons WHERE id = ?", (icon_id,)).fetchone()
+        conn = get_db()
+        row = conn.execute("SELECT file_path, format FROM icons WHERE id = ?", (icon_id,)).fetchone()
         if row:
             icon_path = row["file_path"]
+            icon_format = row["format"]
 
     layout_params = layout or DEFAULT_LAYOUT
     icon_payload = None
     if icon_path:
         icon_payload = {
             "path": icon_path,
+            "format": icon_format,
             "x": layout_params.get("icon", {}).get("x", 300),
             "y": layout_params.get("icon", {}).get("y", 170),
             "scale": layout_params.get("icon", {}).get("scale", 0.45),
+            "color_hex": layout_params.get("icon", {}).get("color_hex"),
         }
 
-    tile = render_tile(
-        {
-            "color_hex": color_hex,
-            "text": text,
-            "layout": layout_params,
-            "icon": icon_payload,
-        }
-    )
-
     render_id = str(uuid.uuid4())
     output_path = RENDERS_DIR / f"{render_id}.png"
-    tile.save(output_path, "PNG")
-
-    with get_db() as conn:
-        conn.execute(
-            "INSERT INTO renders (id, name, icon_id, color_hex, layout_params, output_path, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (
-                render_id,
-                name,
-                icon_id,
-                color_hex,
-                json.dumps({"layout": layout_params, "text": text}),
-                str(output_path),
-                datetime.utcnow().isoformat(),
-            ),
+    try:
+        png_bytes = render_in_pool(
+            {
+                "color_hex": color_hex,
+                "text": text,
+                "layout": layout_params,
+                "icon": icon_payload,
+            },
+            output_path,
         )
+    except BrokenProcessPool:
+        return jsonify({"error": "Renderer unavailable"}), 503
+
+    conn = get_db()
+    conn.execute(
+        f"INSERT INTO renders (id, name, icon_id, color_hex, layout_params, output_path, created_at) VALUES (?, ?, ?, ?, ?, ?, {SQL_NOW})",
+        (
+            render_id,
+            name,
+            icon_id,
+            color_hex,
+            orjson.dumps({"layout": layout_params, "text": text}).decode(),
+            str(output_path),
+        ),
+    )
+    conn.commit()
 
+    if request.args.get("inline") == "1":
+        response = send_file(io.BytesIO(png_bytes), mimetype="image/png")
+        response.headers["X-Render-Id"] = render_id
+        return response
     return jsonify(
         {
             "render_id": render_id,
@@ -425,8 +636,10 @@ def render_api():
 
 @app.route("/api/renders")
 def renders():
-    with get_db() as conn:
-        rows = conn.execute("SELECT * FROM renders ORDER BY created_at DESC LIMIT 50").fetchall()
+    conn = get_db()
+    rows = conn.execute(
+        "SELECT id, name, color_hex, icon_id, layout_params, created_at FROM renders ORDER BY created_at DESC LIMIT 50"
+    ).fetchall()
     return jsonify(
         [
             {
@@ -434,7 +647,7 @@ def renders():
                 "name": row["name"],
                 "color_hex": row["color_hex"],
                 "icon_id": row["icon_id"],
-                "layout_params": json.loads(row["layout_params"]),
+                "layout_params": orjson.loads(row["layout_params"]),
                 "created_at": row["created_at"],
                 "download_url": f"/api/renders/{row['id']}/download",
             }
@@ -445,12 +658,28 @@ def renders():
 
 @app.route("/api/renders/<render_id>/download")
 def render_download(render_id):
-    with get_db() as conn:
-        row = conn.execute("SELECT output_path FROM renders WHERE id = ?", (render_id,)).fetchone()
-    if not row:
+    output_path = RENDERS_DIR / f"{render_id}.png"
+    if not output_path.exists():
         return jsonify({"error": "Not found"}), 404
+    etag = render_id
+    compress = request.args.get("compress")
+    if compress is not None:
+        if compress not in {str(level) for level in range(10)}:
+            return jsonify({"error": "Invalid compress level"}), 400
+        output_path = recompress_png(output_path, int(compress))
+        etag = f"{render_id}-z{compress}"
     as_attachment = request.args.get("download") == "1"
-    return send_file(row["output_path"], mimetype="image/png", as_attachment=as_attachment)
+    response = send_from_directory(
+        RENDERS_DIR,
+        output_path.name,
+        mimetype="image/png",
+        as_attachment=as_attachment,
+        conditional=True,
+        etag=etag,
+        max_age=IMMUTABLE_MAX_AGE,
+    )
+    response.cache_control.immutable = True
+    return response
 
 
 @app.route("/static/<path:filename>")
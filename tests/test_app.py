@@ -1,5 +1,10 @@
 import io
+import os
+import re
+import sqlite3
+import subprocess
 import sys
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 
 import pytest
@@ -10,20 +15,46 @@ sys.path.insert(0, str(ROOT_DIR))
 
 import app as app_module  # noqa: E402
 
+requires_cairo = pytest.mark.skipif(
+    app_module.cairosvg is None, reason="CairoSVG/libcairo not available"
+)
 
-@pytest.fixture()
-def client(tmp_path, monkeypatch):
-    data_dir = tmp_path / "data"
+SVG_ICON = (
+    b'<svg xmlns="http://www.w3.org/2000/svg" width="10" height="10" viewBox="0 0 10 10">'
+    b'<rect x="0" y="0" width="10" height="5" fill="#ff0000"/>'
+    b"</svg>"
+)
+
+
+def _use_data_dir(monkeypatch, data_dir):
     monkeypatch.setattr(app_module, "DATA_DIR", data_dir)
     monkeypatch.setattr(app_module, "DB_PATH", data_dir / "app.db")
     monkeypatch.setattr(app_module, "ICONS_DIR", data_dir / "icons")
     monkeypatch.setattr(app_module, "PREVIEWS_DIR", data_dir / "previews")
     monkeypatch.setattr(app_module, "RENDERS_DIR", data_dir / "renders")
     monkeypatch.setattr(app_module, "STORAGE_READY", False)
-    app_module.init_storage()
+
+
+def _close_thread_db():
+    conn = getattr(app_module._DB_LOCAL, "conn", None)
+    if conn is not None:
+        conn.close()
+        del app_module._DB_LOCAL.conn
+
+
+@pytest.fixture()
+def fresh_client(tmp_path, monkeypatch):
+    _use_data_dir(monkeypatch, tmp_path / "data")
     app_module.app.config.update(TESTING=True)
     with app_module.app.test_client() as test_client:
         yield test_client
+    _close_thread_db()
+
+
+@pytest.fixture()
+def client(fresh_client):
+    app_module.init_storage()
+    return fresh_client
 
 
 def test_colors_endpoint(client):
@@ -129,3 +160,440 @@ def test_icon_upload_list_and_delete(client):
     delete = client.delete(f"/api/icons/{icon_id}")
     assert delete.status_code == 200
     assert delete.get_json()["status"] == "deleted"
+
+
+def test_rasterize_icon_reuses_cached_pixels(tmp_path):
+    icon_path = tmp_path / "icon.png"
+    icon_path.write_bytes(_make_png_bytes().getvalue())
+    app_module._rasterize_icon_cached.cache_clear()
+
+    first = app_module.rasterize_icon(icon_path, 32)
+    second = app_module.rasterize_icon(icon_path, 32)
+
+    assert app_module._rasterize_icon_cached.cache_info().hits == 1
+    assert first is not second
+    assert first.tobytes() == second.tobytes()
+    assert first.size == (32, 32)
+
+
+def test_rasterize_icon_downscales_large_png(tmp_path):
+    icon_path = tmp_path / "large.png"
+    Image.new("RGBA", (2048, 2048), (0, 0, 255, 255)).save(icon_path)
+    app_module._rasterize_icon_cached.cache_clear()
+
+    image = app_module.rasterize_icon(icon_path, 100)
+
+    assert image.size == (100, 100)
+    assert image.getpixel((50, 50)) == (0, 0, 255, 255)
+
+
+def test_render_tile_rounds_corners(client):
+    tile = app_module.render_tile(
+        {"color_hex": "#4ccd4f", "layout": {"corner_radius_px": 30}}
+    )
+    assert tile.mode == "RGBA"
+    assert tile.size == (app_module.TILE_SIZE, app_module.TILE_SIZE)
+    assert tile.getpixel((0, 0))[3] == 0
+    assert tile.getpixel((app_module.TILE_SIZE - 1, app_module.TILE_SIZE - 1))[3] == 0
+    assert tile.getpixel((225, 225)) == (76, 205, 79, 255)
+    assert tile.getpixel((225, 0)) == (76, 205, 79, 255)
+
+
+def test_rounded_mask_is_memoized_per_radius():
+    app_module._MASK_CACHE.clear()
+    first = app_module._rounded_mask(30)
+    assert app_module._rounded_mask(30) is first
+    assert app_module._rounded_mask(12) is not first
+    assert set(app_module._MASK_CACHE) == {
+        (30, app_module.TILE_SIZE),
+        (12, app_module.TILE_SIZE),
+    }
+
+
+def test_load_font_is_cached():
+    app_module.load_font.cache_clear()
+    assert app_module.load_font(48, "semibold") is app_module.load_font(48, "semibold")
+    assert app_module.load_font.cache_info().hits == 1
+
+
+def test_truncate_text_keeps_longest_fitting_prefix():
+    font = app_module.load_font(24, "regular")
+    text = "Kachelgenerator " * 20
+    max_width = 200
+
+    result = app_module.truncate_text(text, font, max_width)
+
+    assert result.endswith("…")
+    prefix = result[:-1]
+    assert text.startswith(prefix)
+    assert font.getlength(result) <= max_width
+    assert font.getlength(text[: len(prefix) + 1] + "…") > max_width
+    assert app_module.truncate_text("Hi", font, max_width) == "Hi"
+    assert app_module.truncate_text(text, font, 0) == "…"
+
+
+def test_render_download_recompresses_on_demand(client):
+    response = client.post(
+        "/api/render",
+        json={"name": "Demo", "color_hex": "#4ccd4f", "text": "Hello"},
+    )
+    download_url = response.get_json()["download_url"]
+
+    compressed = client.get(f"{download_url}?compress=9")
+    assert compressed.status_code == 200
+    assert compressed.mimetype == "image/png"
+    original = client.get(download_url)
+    assert Image.open(io.BytesIO(compressed.data)).tobytes() == Image.open(
+        io.BytesIO(original.data)
+    ).tobytes()
+
+    invalid = client.get(f"{download_url}?compress=12")
+    assert invalid.status_code == 400
+    assert invalid.get_json()["error"] == "Invalid compress level"
+
+
+def test_db_connection_is_reused_per_thread(client):
+    client.get("/api/colors")
+    conn = app_module.get_db()
+    client.get("/api/layout-presets")
+    assert app_module.get_db() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_icon_list_filters_by_query_and_tag(client):
+    for name, tags in [("Alarm Bell", "warning,sound"), ("Calendar", "date")]:
+        client.post(
+            "/api/icons",
+            data={"name": name, "tags": tags, "file": (_make_png_bytes(), "icon.png")},
+            content_type="multipart/form-data",
+        )
+
+    by_query = client.get("/api/icons?query=alarm").get_json()
+    assert [icon["name"] for icon in by_query] == ["Alarm Bell"]
+    by_tag = client.get("/api/icons?tag=DATE").get_json()
+    assert [icon["name"] for icon in by_tag] == ["Calendar"]
+    assert client.get("/api/icons?query=alarm&tag=date").get_json() == []
+    assert len(client.get("/api/icons").get_json()) == 2
+
+
+def test_icon_list_filter_lowercases_umlauts(client):
+    client.post(
+        "/api/icons",
+        data={
+            "name": "Übersicht",
+            "tags": "Ärger,Öffnung",
+            "file": (_make_png_bytes(), "icon.png"),
+        },
+        content_type="multipart/form-data",
+    )
+
+    assert [icon["name"] for icon in client.get("/api/icons?query=über").get_json()] == [
+        "Übersicht"
+    ]
+    assert [icon["name"] for icon in client.get("/api/icons?tag=ÄRGER").get_json()] == [
+        "Übersicht"
+    ]
+    assert client.get("/api/icons?query=uber").get_json() == []
+
+
+def test_missing_images_return_not_found(client):
+    preview = client.get("/api/icons/does-not-exist/preview")
+    assert preview.status_code == 404
+    assert preview.get_json()["error"] == "Not found"
+    download = client.get("/api/renders/does-not-exist/download")
+    assert download.status_code == 404
+    assert download.get_json()["error"] == "Not found"
+
+
+def test_render_inline_returns_png(client):
+    response = client.post(
+        "/api/render?inline=1",
+        json={"name": "Demo", "color_hex": "#4ccd4f", "text": "Hello"},
+    )
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    render_id = response.headers["X-Render-Id"]
+    image = Image.open(io.BytesIO(response.data))
+    assert image.size == (app_module.TILE_SIZE, app_module.TILE_SIZE)
+
+    download = client.get(f"/api/renders/{render_id}/download")
+    assert download.status_code == 200
+    assert download.data == response.data
+
+
+def test_icon_preview_copies_small_png_and_shrinks_large_png(client):
+    small_bytes = _make_png_bytes().getvalue()
+    small_response = client.post(
+        "/api/icons",
+        data={"name": "Small", "file": (io.BytesIO(small_bytes), "small.png")},
+        content_type="multipart/form-data",
+    )
+    small_preview = client.get(f"/api/icons/{small_response.get_json()['id']}/preview")
+    assert small_preview.data == small_bytes
+
+    large = io.BytesIO()
+    Image.new("RGBA", (1024, 512), (0, 255, 0, 255)).save(large, format="PNG")
+    large.seek(0)
+    large_response = client.post(
+        "/api/icons",
+        data={"name": "Large", "file": (large, "large.png")},
+        content_type="multipart/form-data",
+    )
+    large_preview = client.get(f"/api/icons/{large_response.get_json()['id']}/preview")
+    assert Image.open(io.BytesIO(large_preview.data)).size == (256, 128)
+
+
+def test_hot_queries_use_indexes(client):
+    conn = app_module.get_db()
+    renders_plan = " ".join(
+        row["detail"]
+        for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM renders ORDER BY created_at DESC LIMIT 50"
+        )
+    )
+    assert "idx_renders_created" in renders_plan
+    lookup_plan = " ".join(
+        row["detail"]
+        for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT file_path FROM icons WHERE id = ?", ("x",)
+        )
+    )
+    assert "USING INDEX" in lookup_plan
+
+
+def test_renders_history_lists_layout(client):
+    client.post(
+        "/api/render",
+        json={"name": "Demo", "color_hex": "#4ccd4f", "text": "Hello"},
+    )
+    response = client.get("/api/renders")
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    history = response.get_json()
+    assert history[0]["name"] == "Demo"
+    assert history[0]["layout_params"]["text"] == "Hello"
+    assert history[0]["download_url"] == f"/api/renders/{history[0]['id']}/download"
+
+
+def test_json_responses_use_orjson_provider(client):
+    assert isinstance(app_module.app.json, app_module.OrjsonProvider)
+    response = client.get("/api/layout-presets")
+    assert response.mimetype == "application/json"
+    assert response.get_json()[0]["params"] == app_module.DEFAULT_LAYOUT
+
+    invalid = client.post(
+        "/api/layout-presets", data="{not json", content_type="application/json"
+    )
+    assert invalid.status_code == 400
+
+
+def test_init_storage_backfills_icon_format(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    _use_data_dir(monkeypatch, data_dir)
+    with sqlite3.connect(data_dir / "app.db") as conn:
+        conn.execute(
+            "CREATE TABLE icons (id TEXT PRIMARY KEY, name TEXT NOT NULL, tags TEXT, "
+            "file_path TEXT NOT NULL, preview_path TEXT NOT NULL, created_at TEXT NOT NULL)"
+        )
+        conn.execute(
+            "INSERT INTO icons VALUES ('a', 'Old', '', '/icons/a.svg', '/previews/a.png', '2024-01-01')"
+        )
+    conn.close()
+
+    app_module.init_storage()
+
+    with sqlite3.connect(data_dir / "app.db") as conn:
+        assert conn.execute("SELECT format FROM icons WHERE id = 'a'").fetchone() == ("svg",)
+    conn.close()
+
+
+def test_render_download_is_cacheable(client):
+    response = client.post(
+        "/api/render",
+        json={"name": "Demo", "color_hex": "#4ccd4f", "text": "Hello"},
+    )
+    render_id = response.get_json()["render_id"]
+    download_url = response.get_json()["download_url"]
+
+    first = client.get(download_url)
+    assert first.status_code == 200
+    assert first.headers["ETag"] == f'"{render_id}"'
+    assert first.cache_control.public
+    assert first.cache_control.max_age == 31536000
+    assert first.cache_control.immutable
+
+    revalidated = client.get(download_url, headers={"If-None-Match": first.headers["ETag"]})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+
+
+def test_created_at_is_set_by_sqlite(client):
+    client.post(
+        "/api/render",
+        json={"name": "Demo", "color_hex": "#4ccd4f", "text": "Hello"},
+    )
+    created_at = client.get("/api/renders").get_json()[0]["created_at"]
+    assert re.fullmatch(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d{3}Z", created_at)
+
+
+@requires_cairo
+def test_svg_icon_upload_and_tinted_render(client):
+    upload = client.post(
+        "/api/icons",
+        data={"name": "Half", "file": (io.BytesIO(SVG_ICON), "half.svg")},
+        content_type="multipart/form-data",
+    )
+    assert upload.status_code == 201
+    icon_id = upload.get_json()["id"]
+    preview = client.get(f"/api/icons/{icon_id}/preview")
+    assert Image.open(io.BytesIO(preview.data)).size == (256, 256)
+
+    response = client.post(
+        "/api/render?inline=1",
+        json={
+            "color_hex": "#4ccd4f",
+            "icon_id": icon_id,
+            "layout_params": {
+                "icon": {"x": 225, "y": 225, "scale": 0.4, "color_hex": "#0000ff"},
+            },
+        },
+    )
+    assert response.status_code == 200
+    tile = Image.open(io.BytesIO(response.data)).convert("RGBA")
+    assert tile.getpixel((225, 180)) == (0, 0, 255, 255)
+    assert tile.getpixel((225, 270)) == (76, 205, 79, 255)
+
+
+def test_svg_upload_rejected_without_cairo(client, monkeypatch):
+    monkeypatch.setattr(app_module, "cairosvg", None)
+    response = client.post(
+        "/api/icons",
+        data={"name": "Half", "file": (io.BytesIO(SVG_ICON), "half.svg")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 400
+    assert response.get_json()["error"] == "SVG support is not available"
+
+
+def test_render_tile_clamps_icon_size(tmp_path):
+    icon_path = tmp_path / "icon.png"
+    icon_path.write_bytes(_make_png_bytes().getvalue())
+    app_module._rasterize_icon_cached.cache_clear()
+
+    app_module.render_tile(
+        {
+            "color_hex": "#4ccd4f",
+            "icon": {"path": str(icon_path), "x": 225, "y": 225, "scale": 5},
+        }
+    )
+
+    image = app_module.rasterize_icon(icon_path, app_module.TILE_SIZE)
+    assert app_module._rasterize_icon_cached.cache_info().hits == 1
+    assert image.size == (app_module.TILE_SIZE, app_module.TILE_SIZE)
+
+
+def test_rounded_mask_cache_is_bounded_by_clamped_radius():
+    app_module._MASK_CACHE.clear()
+    for radius in range(-10, 2000, 7):
+        app_module._rounded_mask(radius)
+    assert len(app_module._MASK_CACHE) <= app_module.TILE_SIZE // 2 + 1
+    assert app_module._rounded_mask(5000) is app_module._rounded_mask(
+        app_module.TILE_SIZE // 2
+    )
+
+
+def test_recompress_png_replaces_target_atomically(tmp_path, monkeypatch):
+    source = tmp_path / "render.png"
+    Image.new("RGBA", (32, 32), (1, 2, 3, 255)).save(source)
+    replaced = []
+    real_replace = app_module.os.replace
+
+    def record_replace(src, dst):
+        assert not Path(dst).exists()
+        assert Image.open(src).size == (32, 32)
+        replaced.append((Path(src), Path(dst)))
+        real_replace(src, dst)
+
+    monkeypatch.setattr(app_module.os, "replace", record_replace)
+    target = app_module.recompress_png(source, 9)
+
+    assert replaced == [(replaced[0][0], target)]
+    assert replaced[0][0].parent == target.parent
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "render.png",
+        "render.z9.png",
+    ]
+
+
+def test_render_recovers_from_broken_pool(client):
+    broken = app_module._get_executor()
+    crash = broken.submit(os._exit, 1)
+    with pytest.raises(BrokenProcessPool):
+        crash.result()
+
+    response = client.post(
+        "/api/render",
+        json={"name": "Demo", "color_hex": "#4ccd4f", "text": "Hello"},
+    )
+    assert response.status_code == 200
+    assert app_module.EXECUTOR is not broken
+
+
+def test_import_does_not_start_render_pool():
+    result = subprocess.run(
+        [sys.executable, "-c", "import app; assert app.EXECUTOR is None"],
+        cwd=ROOT_DIR,
+        capture_output=True,
+    )
+    assert result.returncode == 0, result.stderr.decode()
+
+
+def test_render_returns_503_when_pool_keeps_breaking(client, monkeypatch):
+    class BrokenExecutor:
+        def submit(self, *args):
+            raise BrokenProcessPool("worker died")
+
+        def shutdown(self, wait=True):
+            pass
+
+    monkeypatch.setattr(app_module, "_new_executor", BrokenExecutor)
+    monkeypatch.setattr(app_module, "EXECUTOR", BrokenExecutor())
+
+    response = client.post("/api/render", json={"color_hex": "#4ccd4f"})
+    assert response.status_code == 503
+    assert response.get_json()["error"] == "Renderer unavailable"
+
+
+def test_render_creates_storage_on_first_request(fresh_client):
+    response = fresh_client.post("/api/render", json={"color_hex": "#4ccd4f"})
+    assert response.status_code == 200
+    render_path = app_module.RENDERS_DIR / f"{response.get_json()['render_id']}.png"
+    assert render_path.exists()
+
+
+def test_icon_upload_creates_storage_on_first_request(fresh_client):
+    response = fresh_client.post(
+        "/api/icons",
+        data={"name": "First", "file": (_make_png_bytes(), "icon.png")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 201
+    icon_id = response.get_json()["id"]
+    assert (app_module.ICONS_DIR / f"{icon_id}.png").exists()
+    assert (app_module.PREVIEWS_DIR / f"{icon_id}.png").exists()
+
+
+@requires_cairo
+def test_svg_tint_replaces_rgb_and_keeps_alpha(tmp_path):
+    icon_path = tmp_path / "half.svg"
+    icon_path.write_bytes(SVG_ICON)
+    app_module._rasterize_icon_cached.cache_clear()
+
+    plain = app_module.rasterize_icon(icon_path, 64)
+    tinted = app_module.rasterize_icon(icon_path, 64, "#0000ff")
+
+    assert app_module._rasterize_icon_cached.cache_info().currsize == 1
+    assert tinted.getchannel("A").tobytes() == plain.getchannel("A").tobytes()
+    assert set(tinted.convert("RGB").getdata()) == {(0, 0, 255)}
+    assert plain.getpixel((32, 10)) == (255, 0, 0, 255)